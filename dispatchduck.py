@@ -8,22 +8,59 @@ Optional: -d, --debug
 """
 
 import sys
+import os
 import argparse
+import stat
 import subprocess
 import signal
 
 __version__ = "2.0.0"
 
-def parse_args():
+# Fixed portion of the tsp pipeline, built once at import so each launch only
+# appends the per-stream arguments
+TSP_BASE_CMD = ("-I", "http", "-P", "continuity", "-O", "fifo")
+
+# splice hints: pages may be moved instead of copied, and more data is coming
+# so the kernel need not flush partial pipe buffers eagerly
+SPLICE_FLAGS = getattr(os, "SPLICE_F_MOVE", 0) | getattr(os, "SPLICE_F_MORE", 0)
+
+# Read size for the userspace fallback loop: TS-packet aligned and just under
+# 128 KiB (188 * 697 = 131,036), so one read drains a typical TCP receive
+# window's worth of data
+READ_CHUNK = 188 * 697
+
+def parse_args(argv=None):
     parser = argparse.ArgumentParser(description="Dispatchduck: Simple tsp wrapper for Dispatcharr")
     parser.add_argument("-i", required=True, help="Required: Stream URL")
     parser.add_argument("-ua", required=True, help="Required: User-Agent string")
     parser.add_argument("-d", "--debug", action="store_true", help="Enable debug output")
     parser.add_argument("-v", "--version", action="version", version=f"Dispatchduck {__version__}")
-    return parser.parse_args()
+    return parser.parse_args(argv)
+
+def grow_pipe(fd):
+    # Best-effort bump of the pipe capacity (Linux defaults to 64 KiB) so a
+    # bursty stream blocks the writing side less often. No-op elsewhere.
+    try:
+        import fcntl
+        fcntl.fcntl(fd, getattr(fcntl, "F_SETPIPE_SZ", 1031), 1 << 20)
+    except (ImportError, OSError):
+        pass
+
+def splice_output(src_fd, dst_fd):
+    # Move bytes kernel-side between the tsp pipe and stdout so they never
+    # touch userspace. os.splice needs Linux and a pipe on at least one end;
+    # tsp's stdout is always a pipe, so only the destination needs checking.
+    if not hasattr(os, "splice") or not stat.S_ISFIFO(os.fstat(dst_fd).st_mode):
+        return False
+    try:
+        while os.splice(src_fd, dst_fd, 1 << 20, flags=SPLICE_FLAGS):
+            pass
+    except OSError:
+        return False
+    return True
 
-def main():
-    args = parse_args()
+def main(argv=None):
+    args = parse_args(argv)
 
     if args.debug:
         print(f"[DEBUG] Stream URL: {args.i}", file=sys.stderr)
@@ -33,34 +70,50 @@ def main():
     user_agent = args.ua
 
     # Construct tsp command
-    cmd = [
-        "tsp",
-        "--user-agent", user_agent,
-        "-I", "http",
-        "-P", "continuity",
-        "-O", "fifo"
-    ]
+    cmd = ["tsp", "--user-agent", user_agent, *TSP_BASE_CMD, args.i]
 
-    # Add the stream URL
-    cmd.extend([args.i])
+    # Format the command once; it is printed here and again on error
+    cmd_str = " ".join(cmd)
 
     if args.debug:
-        print(f"[DEBUG] Running tsp command: {' '.join(cmd)}", file=sys.stderr)
+        print(f"[DEBUG] Running tsp command: {cmd_str}", file=sys.stderr)
     else:
-        print(f"Running tsp command: {' '.join(cmd)}", file=sys.stderr)
-    
+        print(f"Running tsp command: {cmd_str}", file=sys.stderr)
+
+
+    # Reopen stdout with a large buffer so small TS chunks accumulate in
+    # userspace instead of the default 8 KiB BufferedWriter
+    stdout = os.fdopen(sys.stdout.fileno(), "wb", buffering=1 << 20, closefd=False)
+
     try:
-        # Run tsp and pipe output to stdout
-        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=sys.stderr)
-        
-        # Read output in chunks and write to stdout
-        while True:
-            data = process.stdout.read(188 * 64)  # Match buffer settings of Dispatcharr
-            if not data:
-                break
-            sys.stdout.buffer.write(data)
-            sys.stdout.buffer.flush()
-            
+        # Run tsp and pipe output to stdout; bufsize=0 because the pipe fd is
+        # read directly below
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, bufsize=0, stderr=sys.stderr)
+
+        # Prefer the zero-copy splice path; fall back to a userspace copy
+        # when stdout is not a pipe (e.g. redirected to a file)
+        try:
+            src_fd = process.stdout.fileno()
+            grow_pipe(src_fd)
+            grow_pipe(sys.stdout.fileno())
+            if not splice_output(src_fd, sys.stdout.fileno()):
+                # Read into one reusable buffer (process.stdout is the raw
+                # FileIO thanks to bufsize=0), so no bytes object is
+                # allocated per chunk
+                buf = bytearray(READ_CHUNK)
+                view = memoryview(buf)
+                while True:
+                    n = process.stdout.readinto(buf)
+                    if not n:
+                        break
+                    stdout.write(view[:n])
+        finally:
+            try:
+                stdout.flush()
+            except BrokenPipeError:
+                pass
+
+
     except KeyboardInterrupt:
         if args.debug:
             print("[DEBUG] Stream interrupted by user, canceling.", file=sys.stderr)
@@ -68,10 +121,16 @@ def main():
             print("Stream interrupted, canceling.", file=sys.stderr)
         process.terminate()
         process.wait()
+    except BrokenPipeError:
+        # Consumer closed the pipe: a normal shutdown, not a tsp failure.
+        # SIGPIPE is left at SIG_DFL so the kernel usually ends us before
+        # Python ever raises this; handle it once here if it does.
+        process.terminate()
+        process.wait()
     except Exception as e:
         if args.debug:
             print(f"[DEBUG] Error running tsp: {e}", file=sys.stderr)
-            print(f"[DEBUG] Command that failed: {' '.join(cmd)}", file=sys.stderr)
+            print(f"[DEBUG] Command that failed: {cmd_str}", file=sys.stderr)
         else:
             print(f"Error running tsp: {e}", file=sys.stderr)
         sys.exit(1)
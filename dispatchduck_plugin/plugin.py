@@ -1,15 +1,18 @@
 import os
-import stat
 import re
+import shutil
 import subprocess
-import requests
+import tempfile
 from pathlib import Path
-from urllib.parse import urlparse
+from urllib.parse import urlsplit
 from core.models import StreamProfile
 from apps.plugins.models import PluginConfig
 from django.db import transaction
 from typing import Dict, Any
 
+# Resolved once at import; tsp's location does not change while we run
+TSP_BIN = shutil.which("tsp")
+
 class Plugin:
     name = "DispatchDuck Plugin"
     version = "1.0.1"
@@ -18,9 +21,31 @@ class Plugin:
     dd_path = "/data/dispatchduck/dispatchduck.py"
     dd_latest = "https://raw.githubusercontent.com/odm7341/dispatchDuck/refs/heads/main/VERSION"
     dd_url = "https://raw.githubusercontent.com/odm7341/dispatchDuck/refs/heads/main/dispatchduck.py"
+    # Profile parameter template; the {placeholders} are substituted by
+    # Dispatcharr at stream start and must stay unquoted
+    dd_parameters = "-ua {userAgent} -i {streamUrl}"
     base_dir = Path(__file__).resolve().parent
     plugin_key = base_dir.name.replace(" ", "_").lower()
 
+    # Matches the __version__ line near the top of the installed script
+    dd_version_re = re.compile(r'^__version__\s*=\s*["\']([^"\']+)["\']', re.M)
+    _local_version_cache = None
+
+    _session = None
+
+    # Shared session so back-to-back GitHub fetches reuse the same connection,
+    # with a small pool and retries for flaky CDN responses. Built lazily so
+    # merely listing the plugin in the UI never imports requests.
+    @classmethod
+    def _http(cls):
+        if cls._session is None:
+            import requests
+            from requests.adapters import HTTPAdapter, Retry
+            session = requests.Session()
+            session.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=4, max_retries=Retry(total=3, backoff_factor=0.3)))
+            cls._session = session
+        return cls._session
+
     def __init__(self):
         try:
             self.context = PluginConfig.objects.get(key=self.plugin_key)
@@ -32,7 +57,8 @@ class Plugin:
             else:
                 self.settings = {}
 
-        if os.path.isfile(self.dd_path) is False or self.settings.get("local_version") is None:
+        local_version = self.settings.get("local_version")
+        if os.path.isfile(self.dd_path) is False or local_version is None:
             self.actions = [
                 {"id": "install", "label": "Install DispatchDuck", "description": "Click 'Run' to install DispatchDuck, then click the refresh icon in the top right corner."}
             ]
@@ -75,7 +101,7 @@ class Plugin:
             self.actions = [
                 {"id": "create_profile", "label": "Create Stream Profile", "description": "Create a DispatchDuck stream profile using the current settings", "confirm": confirm_profile},
                 {"id": "reset_plugin", "label": "Reset Profile Builder", "description": "Restore default settings for the profile builder", "confirm": confirm_reset},
-                {"id": "check_updates", "label": "Check for Updates", "description": f"Installed Version: v{self.settings.get('local_version')}", "confirm": confirm_update},
+                {"id": "check_updates", "label": "Check for Updates", "description": f"Installed Version: v{local_version}", "confirm": confirm_update},
                 {"id": "uninstall", "label": "Uninstall DispatchDuck", "description": "Uninstall DispatchDuck and reset plugin to defaults", "confirm": confirm_uninstall},
                 {"id": "tsduck_version", "label": "Check tsduck Version", "description": "Check the version of tsduck installed on your system"}
             ]
@@ -83,7 +109,7 @@ class Plugin:
     # Validation functions
     def is_valid_url(self, url: str) -> bool:
         try:
-            result = urlparse(url)
+            result = urlsplit(url)
             return all([result.scheme, result.netloc])
         except ValueError:
             return False
@@ -91,7 +117,30 @@ class Plugin:
     
     # Versioning functions
     def check_local_version(self):
-        if os.path.isfile(self.dd_path):
+        if not os.path.isfile(self.dd_path):
+            return None
+        try:
+            mtime = os.path.getmtime(self.dd_path)
+        except OSError:
+            return None
+
+        cached = self._local_version_cache
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        # Read the version straight from the file instead of forking a whole
+        # python3 interpreter just to print it
+        version = None
+        try:
+            with open(self.dd_path, "r", encoding="utf-8") as f:
+                match = self.dd_version_re.search(f.read(4096))
+            if match:
+                version = match.group(1)
+        except OSError:
+            pass
+
+        if version is None:
+            # Fall back to asking the script itself if the pattern ever changes
             try:
                 result = subprocess.run(
                     ["python3", self.dd_path, "-v"],
@@ -101,31 +150,64 @@ class Plugin:
                 )
                 tokens = result.stdout.strip().split()
                 if len(tokens) >= 2:
-                    return tokens[1].strip()
-                else:
-                    return None
+                    version = tokens[1].strip()
             except subprocess.CalledProcessError:
-                return None
-        else:
-            return None
+                version = None
+
+        # Store on the class so the cache survives the fresh Plugin() that
+        # Dispatcharr builds per action, like the _session cache in _http()
+        type(self)._local_version_cache = (mtime, version)
+        return version
 
     def check_remote_version(self):
-        resp = requests.get(self.dd_latest)
+        # Send the ETag from the last check so an unchanged VERSION file
+        # comes back as a bodyless 304
+        headers = {}
+        etag = self.settings.get("remote_version_etag")
+        cached_version = self.settings.get("remote_version")
+        if etag and cached_version:
+            headers["If-None-Match"] = etag
+        resp = self._http().get(self.dd_latest, headers=headers)
+        if resp.status_code == 304:
+            return cached_version
         resp.raise_for_status()
         version = resp.text.strip()
+        new_etag = resp.headers.get("ETag")
+        if new_etag:
+            self.persist_settings({"remote_version_etag": new_etag, "remote_version": version})
         return version
 
-    # Handles installation and updates
-    def install(self):
+    # Streams the latest dispatchduck script to a temp file and atomically
+    # swaps it into place, so an interrupted download can never leave a
+    # truncated script behind for a running stream to pick up
+    def download_script(self):
         path = os.path.dirname(self.dd_path)
         os.makedirs(path, exist_ok=True)
-        resp = requests.get(self.dd_url)
-        resp.raise_for_status()
-        with open(self.dd_path, "w", encoding="utf-8") as f:
-            f.write(resp.text)
-        # set executable
-        st = os.stat(self.dd_path)
-        os.chmod(self.dd_path, st.st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+        tmp = tempfile.NamedTemporaryFile(dir=path, prefix=".dispatchduck-", mode="wb", delete=False)
+        try:
+            with self._http().get(self.dd_url, stream=True) as resp:
+                resp.raise_for_status()
+                resp.raw.decode_content = True
+                shutil.copyfileobj(resp.raw, tmp, length=65536)
+            tmp.flush()
+            os.fsync(tmp.fileno())
+            tmp.close()
+            # set executable; absolute mode because NamedTemporaryFile creates
+            # the file 0600, and OR-ing the execute bits onto that would leave
+            # group/other unable to read (and so run) the script
+            os.chmod(tmp.name, 0o755)
+            os.replace(tmp.name, self.dd_path)
+        except BaseException:
+            tmp.close()
+            try:
+                os.remove(tmp.name)
+            except OSError:
+                pass
+            raise
+
+    # Handles installation and updates
+    def install(self):
+        self.download_script()
         self.persist_settings({"local_version": self.check_local_version()})
         return {"status": "ok", "message": f"Installed Dispatchwrapparr v{self.settings.get('local_version')} to {self.dd_path}"}
 
@@ -135,37 +217,22 @@ class Plugin:
         if local_version == remote_version:
             return {"status": "ok", "message": "Dispatchwrapparr is already up to date"}
         else:
-            resp = requests.get(self.dd_url)
-            resp.raise_for_status()
-            with open(self.dd_path, "w", encoding="utf-8") as f:
-                f.write(resp.text)
-            # set executable
-            st = os.stat(self.dd_path)
-            os.chmod(self.dd_path, st.st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+            self.download_script()
             self.persist_settings({"local_version": self.check_local_version()})
             return {"status": "ok", "message": f"Updated Dispatchwrapparr from v{local_version} to v{remote_version}"}
 
     # Handles stream profile creation and form validation
     def create_profile(self):
-        if (self.settings.get("profile_name") or None) is None:
+        profile_name = (self.settings.get("profile_name") or "").strip()
+        if not profile_name:
             return {"status": "error", "message": "Please specify a profile name!"}
-        path = os.path.dirname(self.dd_path)
-        profile_name = self.settings.get("profile_name").strip()
         if StreamProfile.objects.filter(name__iexact=profile_name).first():
             return {"status": "error", "message": f"Profile '{profile_name}' already exists!"}
 
-        parameters = [
-            "-ua", "{userAgent}",
-            "-i", "{streamUrl}"
-        ]
-
-        # Convert all paramaters into a string
-        parameter_string = " ".join(parameters)
-
         profile = StreamProfile(
             name=profile_name,
             command=self.dd_path,
-            parameters=parameter_string,
+            parameters=self.dd_parameters,
             locked=False,
             is_active=True,
         )
@@ -179,13 +246,14 @@ class Plugin:
     # Simply function for storing settings in db
     def persist_settings(self, updates: Dict[str, Any], clear: list[str] | None = None) -> dict:
         clear = clear or []
+        # Keep the read-modify-write inside one transaction so the row lock
+        # actually covers the update and it all lands in a single round-trip
         with transaction.atomic():
             cfg, _ = PluginConfig.objects.select_for_update().get_or_create(key=self.plugin_key, defaults={"settings": {}})
-        for key in clear:
-            cfg.settings.pop(key, None)
-
-        cfg.settings.update(updates)
-        cfg.save(update_fields=["settings", "updated_at"])
+            for key in clear:
+                cfg.settings.pop(key, None)
+            cfg.settings.update(updates)
+            cfg.save(update_fields=["settings", "updated_at"])
         self.settings = cfg.settings
         return cfg.settings
 
@@ -220,9 +288,11 @@ class Plugin:
 
     # function to check if tsduck is installed
     def tsduck_version(self):
+        if TSP_BIN is None:
+            return None
         try:
             result = subprocess.run(
-                ["tsp", "--version"],
+                [TSP_BIN, "--version"],
                 capture_output=True,
                 text=True,
                 check=True
@@ -234,7 +304,6 @@ class Plugin:
                 return version_part.strip()
             else:
                 # Fallback: try to extract version number with regex pattern
-                import re
                 version_match = re.search(r'version\s+([0-9.-]+(?:-[0-9]+)?)', output)
                 if version_match:
                     return version_match.group(1)